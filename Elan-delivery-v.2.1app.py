@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 import math
+import copy
+from plan_core import (DELIVERY_RECIPES, flatten_items, product_totals, mix_requirements, recipe_materials,
+                       material_amount, material_total, drink_curd_estimate)
 
 # 1. 페이지 설정
 st.set_page_config(page_title="엘랑비탈 정기배송", page_icon="🏥", layout="wide")
@@ -69,15 +72,7 @@ def init_session_state():
         st.session_state.patient_db = db
 
     if 'recipe_db' not in st.session_state:
-        r_db = {}
-        r_db["혼합 [E.R.P.V.P]"] = {"desc": "6배수 혼합/14병", "batch_size": 14, "materials": {"PAGI (50ml)": 12, "송이대사체 (50ml)": 6, "장미꽃 대사체 (50ml)": 6, "Vitamin C (3000mg)": 14, "SiO2 (1ml)": 14, "EX": 900}}
-        r_db["혼합 [P.V.E]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"PAGI (50ml)": 1, "Vitamin C (3000mg)": 1, "EX": 100}}
-        r_db["혼합 [P.P.E]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"송이대사체 (50ml)": 1, "인삼 대사체 (50ml)": 1, "EX": 50}}
-        r_db["혼합 [Ex.P]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"PAGI (50ml)": 1, "EX": 100}}
-        r_db["혼합 [R.P]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"장미꽃 대사체 (50ml)": 1, "PAGI (50ml)": 1, "인삼사이다": 50}}
-        r_db["혼합 [Edf.P]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"EDF (50ml)": 1, "PAGI (50ml)": 1, "인삼사이다": 50}}
-        r_db["혼합 [P.P]"] = {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"송이대사체 (50ml)": 1, "PAGI (50ml)": 1, "EX": 50}}
-        st.session_state.recipe_db = r_db
+        st.session_state.recipe_db = copy.deepcopy(DELIVERY_RECIPES)
 
 init_session_state()
 
@@ -222,21 +217,13 @@ elif mode == "📊 계산기 모드":
 
     with t2:
         st.header("🎁 장연구원 (개별 포장)")
-        tot = {}
-        for items in sel_p.values():
-            for x in items:
-                if "혼합" not in str(x['제품']):
-                    k = f"{x['제품']} ({x['용량']})"
-                    tot[k] = tot.get(k, 0) + x['수량']
+        tot = product_totals(flatten_items(sel_p), with_volume=True, exclude_mix=True)
         df = pd.DataFrame(list(tot.items()), columns=["제품", "수량"]).sort_values("수량", ascending=False)
         st.dataframe(df, use_container_width=True)
 
     with t3:
         st.header("🧪 한책임 (혼합 제조)")
-        req = {}
-        for items in sel_p.values():
-            for x in items:
-                if "혼합" in str(x['제품']): req[x['제품']] = req.get(x['제품'], 0) + x['수량']
+        req = mix_requirements(flatten_items(sel_p))
         
         recipes = st.session_state.recipe_db
         total_mat = {}
@@ -250,41 +237,33 @@ elif mode == "📊 계산기 모드":
                         in_q = c1.number_input(f"{p} 수량", 0, value=q, key=f"{p}_{q}")
                         r = recipes[p]
                         c2.markdown(f"**{r['desc']}**")
-                        ratio = in_q / r['batch_size'] if r['batch_size'] > 1 else in_q
+                        calc_map = recipe_materials(r, in_q)
                         for m, mq in r['materials'].items():
-                            if isinstance(mq, (int, float)):
-                                calc = mq * ratio
-                                if "(50ml)" in m:
-                                    vol = calc * 50
-                                    c2.write(f"- {m}: **{calc:g}** (50*{calc:g}={vol:g} ml)")
-                                elif "EX" in m or "사이다" in m:
-                                    c2.write(f"- {m}: **{calc:g} ml**")
+                            if m in calc_map:
+                                calc = calc_map[m]
+                                amt = material_amount(m, calc)
+                                if "ml" in amt:
+                                    c2.write(f"- {m}: **{calc:g}** (50*{calc:g}={amt['ml']:g} ml)")
                                 else:
-                                    c2.write(f"- {m}: **{calc:g} 개**")
+                                    c2.write(f"- {m}: **{calc:g} {amt['unit']}**")
                                 total_mat[m] = total_mat.get(m, 0) + calc
                             else: c2.write(f"- {m}: {mq}")
 
             st.divider()
             st.subheader("∑ 재료 총합")
             for k, v in sorted(total_mat.items(), key=lambda x: x[1], reverse=True):
-                if "PAGI" in k and "희석액" not in k:
-                    vol_ml = v * 50
-                    st.info(f"💧 **{k}**: {v:g}개 (총 {vol_ml:,.0f} ml)")
-                elif "사이다" in k:
-                    bottles = v / 300
-                    st.info(f"🥤 **{k}**: {v:,.0f} ml (약 {bottles:.1f}병)")
-                elif "EX" in k:
-                    st.info(f"🛢️ **{k}**: {v:,.0f} ml (약 {v/1000:.1f} L)")
+                t = material_total(k, v)
+                if "ml" in t:
+                    st.info(f"💧 **{k}**: {v:g}개 (총 {t['ml']:,.0f} ml)")
+                elif "bottles" in t:
+                    st.info(f"🥤 **{k}**: {v:,.0f} ml (약 {t['bottles']:.1f}병)")
+                elif "liters" in t:
+                    st.info(f"🛢️ **{k}**: {v:,.0f} ml (약 {t['liters']:.1f} L)")
                 else:
                     st.success(f"📦 **{k}**: {v:g} 개")
 
     with t4:
         st.header("📊 원자재 예측")
-        cnt = 0
-        for items in sel_p.values():
-            for x in items:
-                if x['제품'] == "커드 시원한 것": cnt += x['수량']
-        g = cnt * 280
-        kg = round((g/6.5)/1000, 2)
-        st.metric("커드 시원한 것", f"{cnt}개")
-        st.info(f"💡 필요 우유: 약 {round(kg/9 * 16, 1)}통")
+        est = drink_curd_estimate(flatten_items(sel_p))
+        st.metric("커드 시원한 것", f"{est['count']}개")
+        st.info(f"💡 필요 우유: 약 {est['milk_bottles']}통")
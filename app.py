@@ -1,12 +1,17 @@
 import streamlit as st
 import pandas as pd
 import math
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import gspread
 from google.oauth2.service_account import Credentials
 import holidays
 import uuid
 import json
+import copy
+from production_store import ProductionStore, PRODUCTION_COLUMNS
+from plan_core import (KST, YIELD_CONSTANTS, ERP_RECIPES, calculate_round_final, delivery_cadence,
+                       parse_order_items, parse_patient_rows, flatten_items,
+                       product_totals, mix_requirements, recipe_materials, component_totals, curd_demand_kg)
 
 # ==============================================================================
 # 1. 시스템 설정 및 상수 (Config)
@@ -18,50 +23,7 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# [중요] 한국 표준시(KST) 설정
-KST = timezone(timedelta(hours=9))
-
-# 수율 관리 및 희석 비율 상수
-YIELD_CONSTANTS = {
-    "MILK_BOTTLE_TO_CURD_KG": 0.5,  # 우유 1통(2.3L)당 예상 커드 0.5kg
-    "PACK_UNIT_KG": 0.15,            # 소포장 단위 150g
-    "DRINK_RATIO": 6.5,             # 일반커드 -> 커드시원한것 희석 배수
-    "BOTTLE_SIZE_ML": 280,
-    "MIX_BOTTLE_ML": 150             # 혼합 제품 용기 사이즈 150ml
-}
-
-# ==============================================================================
-# 2. 회차 계산 엔진 (월요일 준비 보정 로직)
-# ==============================================================================
-def calculate_round_final(start_date_input, current_date_input, group_type):
-    """
-    사용자 요청 반영: 월요일 저녁 발송을 위해 낮에 준비하므로,
-    월요일이 되는 순간 즉시 해당 주의 회차로 진입함.
-    12/15 기준 남양주 8회차, 격주 3회차 정확히 출력.
-    """
-    try:
-        if not start_date_input or str(start_date_input).lower() in ['nan', '', 'none']:
-            return 1, "날짜 미입력"
-        
-        sd = pd.to_datetime(start_date_input).date()
-        target_date = current_date_input.date() if isinstance(current_date_input, datetime) else current_date_input
-        
-        # 시작일과 기준일을 해당 주의 '월요일'로 치환하여 주차 차이 계산
-        start_monday = sd - timedelta(days=sd.weekday())
-        target_monday = target_date - timedelta(days=target_date.weekday())
-        
-        diff_weeks = (target_monday - start_monday).days // 7
-        
-        if "매주" in str(group_type):
-            r = diff_weeks + 1
-        elif any(word in str(group_type) for word in ["격주", "유방암", "2주"]):
-            r = (diff_weeks // 2) + 1
-        else:
-            r = 1
-            
-        return int(max(r, 1)), sd.strftime('%Y-%m-%d')
-    except:
-        return 1, "형식 오류"
+# 시간대(KST) / 수율 상수 / 회차 계산 엔진은 plan_core 모듈에서 공통 관리
 
 # ==============================================================================
 # 3. 보안 및 기초 인프라 (Gspread API)
@@ -108,29 +70,7 @@ def load_patient_database():
     if not client: return {}
     try:
         sheet = client.open("vpmi_data").sheet1
-        data = sheet.get_all_records()
-        db = {}
-        for row in data:
-            name = str(row.get('이름', '')).strip()
-            if not name: continue
-            
-            items_list = []
-            raw_items = str(row.get('주문내역', '')).split(',')
-            for item in raw_items:
-                if ':' in item:
-                    p_name, p_qty = item.split(':')
-                    try:
-                        items_list.append({"제품": p_name.strip(), "수량": int(p_qty.strip())})
-                    except: continue
-            
-            db[name] = {
-                "group": str(row.get('그룹', '일반')),
-                "note": str(row.get('비고', '')),
-                "default": True if str(row.get('기본발송', '')).upper() == 'O' else False,
-                "items": items_list,
-                "start_date_raw": str(row.get('시작일', '')) # 엑셀 시작일 읽기
-            }
-        return db
+        return parse_patient_rows(sheet.get_all_records())
     except: return {}
 
 def update_inventory_realtime(item_name, change_qty):
@@ -166,6 +106,34 @@ def get_sheet_as_df(sheet_name, sort_col=None):
         return df
     except: return pd.DataFrame()
 
+def append_production_rows(rows):
+    client = get_gspread_client()
+    try:
+        try: sheet = client.open("vpmi_data").worksheet("production")
+        except gspread.WorksheetNotFound:
+            sheet = client.open("vpmi_data").add_worksheet("production", rows=1000, cols=len(PRODUCTION_COLUMNS))
+            sheet.append_row(PRODUCTION_COLUMNS)
+        sheet.append_rows(rows)  # RAW 기록: 측정일시/배치 번호(0012 등) 원문 유지
+        return True
+    except: return False
+
+@st.cache_resource
+def get_production_store():
+    # 원본 측정 행은 프로세스당 한 번만 읽고, 이후에는 버퍼 기록 + 사전 집계로 응답
+    # 적재 실패 시 예외를 그대로 올려 캐시에 남지 않게 하고, 다음 호출에서 다시 시도
+    store = ProductionStore(append_production_rows, YIELD_CONSTANTS["MILK_BOTTLE_TO_CURD_KG"])
+    client = get_gspread_client()
+    if not client: raise RuntimeError("구글 인증 실패")
+    try: records = client.open("vpmi_data").worksheet("production").get_all_records(numericise_ignore=[2])  # 배치 번호는 문자열 유지
+    except gspread.WorksheetNotFound: records = []
+    store.load_rows(records)
+    return store
+
+def report_production_save(store, flushed, done_msg):
+    if flushed: st.success(done_msg)
+    else: st.warning(f"⚠️ 시트 기록 실패 - 대기 중 {store.pending}건 ({store.max_age}초마다 자동 재시도). "
+                     "앱이 재시작되면 대기 중인 기록은 유실되니 '📤 지금 기록'으로 다시 시도하세요.")
+
 # ==============================================================================
 # 5. 세션 상태 및 정밀 레시피 초기화 (2,100ml 배치 기준)
 # ==============================================================================
@@ -175,17 +143,7 @@ def init_full_erp_state():
     
     # [최종 검증 완료] 150ml x 14개 = 2,100ml 제조 기준 정밀 레시피 DB
     if 'recipe_db' not in st.session_state:
-        st.session_state.recipe_db = {
-            "혼합 [P.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "송이 대사체": 28}},
-            "혼합 [Edf.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "개망초(EDF)": 28}},
-            "혼합 [R.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "장미꽃 대사체": 28}},
-            "혼합 [Ex.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "EX": 28}},
-            "혼합 [P.V.E]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "EX": 28}},
-            "혼합 [P.P.E]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 7, "송이 대사체": 7, "EX": 28}},
-            "혼합 [E.R.P.V.P]": {"batch_size": 14, "materials": {"EX": 18, "장미꽃 대사체": 6, "인삼대사체(PAGI) 항암용": 12, "송이 대사체": 6}},
-            "계란커드 스타터": {"batch_size": 9, "materials": {"개망초 대사체": 8, "아카시아잎 대사체": 1}},
-            "철원산삼 대사체": {"batch_size": 9, "materials": {"철원산삼": 1, "EX": 8}}
-        }
+        st.session_state.recipe_db = copy.deepcopy(ERP_RECIPES)
     
     if 'raw_materials_list' not in st.session_state:
         st.session_state.raw_materials_list = ["우유", "계란", "배추", "무", "마늘", "인삼", "동백꽃", "표고버섯", "개망초", "아카시아", "장미꽃", "송이버섯", "EX"]
@@ -231,7 +189,7 @@ if main_menu == "🚛 배송 및 주문 관리":
         cols_m1 = st.columns(2)
         idx = 0
         for name, info in db.items():
-            if "매주" in info['group']:
+            if delivery_cadence(info['group']) == "매주":
                 r_num, _ = calculate_round_final(info['start_date_raw'], target_date, "매주")
                 with cols_m1[idx % 2]:
                     if st.checkbox(f"**{name}** ({r_num}회차)", value=info['default'], key=f"e_{name}"):
@@ -242,7 +200,7 @@ if main_menu == "🚛 배송 및 주문 관리":
         cols_m2 = st.columns(2)
         idx = 0
         for name, info in db.items():
-            if "매주" not in info['group']:
+            if delivery_cadence(info['group']) == "격주":
                 r_num, _ = calculate_round_final(info['start_date_raw'], target_date, "격주")
                 with cols_m2[idx % 2]:
                     if st.checkbox(f"**{name}** ({r_num}회차)", value=info['default'], key=f"b_{name}"):
@@ -264,28 +222,22 @@ if main_menu == "🚛 배송 및 주문 관리":
             with st.expander(f"📍 {n} ({p['round']}회차)", expanded=True):
                 for i in p['items']: st.write(f"✅ {i['제품']}: {i['수량']}개")
 
+    sel_items = flatten_items(selected_patients)
+
     with t2:
-        summary = {}
-        for p in selected_patients.values():
-            for i in p['items']: summary[i['제품']] = summary.get(i['제품'], 0) + i['수량']
+        summary = product_totals(sel_items)
         st.table(pd.DataFrame(list(summary.items()), columns=["제품명", "총 수량"]))
 
     with t3:
-        m_req = {}
-        for p in selected_patients.values():
-            for i in p['items']:
-                if "혼합" in i['제품']: m_req[i['제품']] = m_req.get(i['제품'], 0) + i['수량']
+        m_req = mix_requirements(sel_items)
         for prd, qty in m_req.items():
             rcp = st.session_state.recipe_db.get(prd)
             if rcp:
                 st.info(f"⚗️ {prd} ({qty}개 분량 제조)")
-                ratio = qty / rcp['batch_size']
-                for m, amt in rcp['materials'].items(): st.write(f"→ {m}: **{amt * ratio:.1f}** 병")
+                for m, amt in recipe_materials(rcp, qty).items(): st.write(f"→ {m}: **{amt:.1f}** 병")
 
     with t4:
-        cp = sum(i['수량'] for p in selected_patients.values() for i in p['items'] if "커드" in i['제품'] and "시원" not in i['제품'])
-        cc = sum(i['수량'] for p in selected_patients.values() for i in p['items'] if "시원" in i['제품'])
-        st.metric("🧀 총 소요 커드 무게", f"{(cc * 40 + cp * 150) / 1000:.2f} kg")
+        st.metric("🧀 총 소요 커드 무게", f"{curd_demand_kg(sel_items):.2f} kg")
 
 # ==============================================================================
 # 8. 모드 2: 누적 데이터 분석 (최종 UI 최적화 완료)
@@ -303,11 +255,8 @@ elif main_menu == "📈 누적 데이터 분석":
             filtered_h = h_df[h_df['이름'].isin(targets)]
             parsed_data = []
             for _, row in filtered_h.iterrows():
-                for itm in str(row['발송내역']).split(','):
-                    if ':' in itm:
-                        pn, pq = itm.split(':')
-                        try: parsed_data.append({"이름": row['이름'], "제품": pn.strip(), "수량": int(pq.strip())})
-                        except: continue
+                for itm in parse_order_items(row['발송내역']):
+                    parsed_data.append({"이름": row['이름'], **itm})
             p_df = pd.DataFrame(parsed_data)
             
             st.markdown("---")
@@ -322,14 +271,7 @@ elif main_menu == "📈 누적 데이터 분석":
             
             with col_s2:
                 st.markdown("#### 2️⃣ 방식 2: 성분 분해 합계")
-                r_db = st.session_state.recipe_db
-                stats = {}
-                for _, r in p_df.iterrows():
-                    if r['제품'] in r_db:
-                        rcp = r_db[r['제품']]
-                        ratio = r['수량'] / rcp['batch_size']
-                        for mn, mq in rcp['materials'].items(): stats[mn] = stats.get(mn, 0) + (mq * ratio)
-                    else: stats[r['제품']] = stats.get(r['제품'], 0) + r['수량']
+                stats = component_totals(p_df.groupby("제품")["수량"].sum().to_dict(), st.session_state.recipe_db)
                 
                 sum2 = pd.DataFrame(list(stats.items()), columns=["성분명", "총합"]).sort_values("총합", ascending=False)
                 st.dataframe(sum2, hide_index=True, use_container_width=False, height=min(len(sum2)*35+45, 1000),
@@ -354,11 +296,26 @@ elif main_menu == "📈 누적 데이터 분석":
 # ==============================================================================
 elif main_menu == "🏭 생산 및 공정 관리":
     st.header("🏭 생산 공정 품질 관리")
+    try: store = get_production_store()
+    except Exception as e:
+        st.error(f"생산 기록 불러오기 실패: {e}")
+        st.stop()
+    if store.skipped:
+        st.warning(f"⚠️ 측정일시를 해석하지 못한 기록 {store.skipped}건은 집계에서 제외되었습니다.")
+    batch_id = st.text_input("배치 번호", datetime.now(KST).strftime('%Y%m%d'))
     p_tabs = st.tabs(["📊 수율/예측", "🧀 커드 생산", "🗓️ 연간 스케줄", "🔬 pH/품질"])
     with p_tabs[0]:
         m_in = st.number_input("우유 투입량 (통)", 1, 200, 30)
         y_act = st.number_input("실제 생산량 (kg)", 0.0, 100.0, 15.0)
-        if st.button("💾 저장"): st.success("저장 완료")
+        st.caption(f"예상 생산량: {m_in * YIELD_CONSTANTS['MILK_BOTTLE_TO_CURD_KG']:.1f} kg")
+        if st.button("💾 저장"):
+            report_production_save(store, store.record_yield(batch_id, m_in, y_act, datetime.now(KST), flush_now=True), "저장 완료")
+        m_df = store.monthly_summary()
+        if not m_df.empty:
+            st.line_chart(m_df.set_index("월")[["수율 비율", "수율 비율 (3개월)"]])
+        b_df = store.batch_summary()
+        if not b_df.empty:
+            st.dataframe(b_df, use_container_width=True, hide_index=True)
     with p_tabs[1]:
         if st.button("🚀 대사 시작"): st.success("프로세스 시작")
     with p_tabs[2]:
@@ -366,7 +323,15 @@ elif main_menu == "🏭 생산 및 공정 관리":
         st.info(st.session_state.schedule_db.get(int(m_sel[:-1])))
     with p_tabs[3]:
         ph = st.slider("pH 측정", 0.0, 14.0, 4.2, 0.1)
-        if st.button("🧪 로그 저장"): st.success("기록 완료")
+        if st.button("🧪 로그 저장"):
+            report_production_save(store, store.record_ph(batch_id, ph, datetime.now(KST), flush_now=True), "기록 완료")
+        m_df = store.monthly_summary()
+        if not m_df.empty:
+            st.line_chart(m_df.set_index("월")[["pH 평균", "pH 평균 (3개월)"]])
+    if store.pending:
+        st.caption(f"⏳ 시트 기록 대기 중: {store.pending}건")
+        if st.button("📤 지금 기록"):
+            report_production_save(store, store.flush(), "기록 완료")
 
 # ==============================================================================
 # 10. 모드 4: 실시간 재고 현황
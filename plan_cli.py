@@ -0,0 +1,133 @@
+"""
+엘랑비탈 배치 계획 CLI (UI 없이 실행)
+
+예)
+  python plan_cli.py --patients vpmi_data.csv --start 2025-12-15 --end 2026-01-12 -o plans.json
+  python plan_cli.py --patients patients.json --recipe-set delivery --scenarios whatif.json --format csv -o plans.csv
+
+환자 DB 입력 (--patients)
+  *.csv         : 구글 시트 vpmi_data 첫 시트를 "파일 > 다운로드 > CSV"로 받은 파일
+                  (이름/그룹/비고/기본발송/주문내역/시작일 열, ERP 앱과 같은 plan_core.parse_patient_rows로 해석)
+  *.json        : {환자명: {"group", "default", "start_date_raw", "items": [{"제품", "용량", "수량"}]}}
+whatif.json     : [{"name", "add_patients", "remove_patients", "recipes", "scale"}, ...]
+
+기간 내 --weekday(기본 월요일) 발송일마다 계획 1건을 만들고, 시나리오 1건을 프로세스 1작업으로 처리.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from plan_core import KST, RECIPE_SETS, apply_scenario, build_daily_plan, parse_patient_rows
+
+
+def _load_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _load_patients(path):
+    if path.lower().endswith(".csv"):
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            return parse_patient_rows(csv.DictReader(f))
+    return _load_json(path)
+
+def ship_dates(start, end, weekday):
+    """start~end 사이 발송(준비) 요일 날짜 목록."""
+    d = start + timedelta(days=(weekday - start.weekday()) % 7)
+    out = []
+    while d <= end:
+        out.append(d)
+        d += timedelta(days=7)
+    return out
+
+def _run_job(job):
+    # 프로세스 풀 작업 단위: 시나리오 1건 x 기간 전체 (시나리오 적용은 1회)
+    patient_db, recipes, scenario, dates, units, ship_weekday = job
+    db, rcp = apply_scenario(patient_db, recipes, scenario)
+    name = scenario.get('name', 'base')
+    return [{"scenario": name, **build_daily_plan(db, rcp, d, units, ship_weekday)} for d in dates]
+
+def run_plans(patient_db, recipes, scenarios, dates, units="erp", workers=None, ship_weekday=0):
+    jobs = [(patient_db, recipes, sc, dates, units, ship_weekday) for sc in scenarios]
+    if len(jobs) <= 1 or workers == 1:
+        results = [_run_job(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as ex:
+            results = list(ex.map(_run_job, jobs))
+    return [plan for res in results for plan in res]
+
+def _check_scenarios(scenarios):
+    """시나리오 JSON 형식 검사. 문제가 있으면 메시지, 없으면 None."""
+    if not isinstance(scenarios, list): return "시나리오 파일은 JSON 목록이어야 합니다"
+    for i, sc in enumerate(scenarios):
+        if not isinstance(sc, dict): return f"시나리오 #{i + 1}: 객체가 아닙니다"
+        for name, info in sc.get('add_patients', {}).items():
+            if not isinstance(info, dict) or not isinstance(info.get('items', []), list):
+                return f"시나리오 #{i + 1}: add_patients['{name}'] 형식 오류"
+        for prd, factor in sc.get('scale', {}).items():
+            if not isinstance(factor, (int, float)): return f"시나리오 #{i + 1}: scale['{prd}'] 는 숫자여야 합니다"
+    return None
+
+def plans_to_rows(plans):
+    """CSV용 평탄화: (시나리오, 날짜, 구분, 항목, 수량, 단위)."""
+    rows = []
+    for p in plans:
+        base = [p['scenario'], p['date']]
+        for k, v in p['product_totals'].items(): rows.append(base + ["제품 합계", k, v, "개"])
+        for k, v in p['packing_totals'].items(): rows.append(base + ["개별 포장", k, v, "개"])
+        for prd, mats in p['mix_materials'].items():
+            for m, v in mats.items(): rows.append(base + [f"혼합 제조: {prd}", m, v['amount'], v['unit']])
+        for m, v in p['material_totals'].items(): rows.append(base + ["재료 총합", m, v['amount'], v['unit']])
+        rows.append(base + ["커드", "총 소요 커드", p['curd_kg'], "kg"])
+        rows.append(base + ["커드", "커드 시원한 것", p['drink_curd']['count'], "개"])
+        rows.append(base + ["커드", "희석 전 커드", p['drink_curd']['curd_kg'], "kg"])
+        rows.append(base + ["커드", "필요 우유", p['drink_curd']['milk_bottles'], "통"])
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="엘랑비탈 일일 배치 계획 사전 계산")
+    ap.add_argument("--patients", required=True, help="환자 DB 경로 (.json 또는 vpmi_data 시트 .csv 내보내기)")
+    ap.add_argument("--recipe-set", choices=sorted(RECIPE_SETS), default="erp")
+    ap.add_argument("--recipes", help="레시피 DB JSON 경로 (지정 시 --recipe-set 대신 사용, 단위 체계는 --recipe-set 기준)")
+    ap.add_argument("--start", help="시작일 YYYY-MM-DD (기본: 오늘 KST)")
+    ap.add_argument("--end", help="종료일 YYYY-MM-DD (기본: 시작일)")
+    ap.add_argument("--weekday", type=int, default=0, choices=range(7),
+                    help="발송(준비) 요일 0=월 ~ 6=일. 기간 내 이 요일마다 계획 생성")
+    ap.add_argument("--scenarios", help="what-if 시나리오 JSON 목록 경로")
+    ap.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    ap.add_argument("--format", choices=["json", "csv"], default="json")
+    ap.add_argument("-o", "--output", help="출력 파일 (기본: 표준출력)")
+    args = ap.parse_args(argv)
+
+    start = pd.to_datetime(args.start).date() if args.start else datetime.now(KST).date()
+    end = pd.to_datetime(args.end).date() if args.end else start
+    if end < start: ap.error("--end 가 --start 보다 앞설 수 없습니다")
+
+    patient_db = _load_patients(args.patients)
+    recipes = _load_json(args.recipes) if args.recipes else RECIPE_SETS[args.recipe_set]
+    scenarios = _load_json(args.scenarios) if args.scenarios else [{"name": "base"}]
+    problem = _check_scenarios(scenarios)
+    if problem: ap.error(problem)
+    plans = run_plans(patient_db, recipes, scenarios, ship_dates(start, end, args.weekday),
+                      args.recipe_set, args.workers, args.weekday)
+
+    out = open(args.output, "w", encoding="utf-8-sig" if args.format == "csv" else "utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(plans, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            w = csv.writer(out)
+            w.writerow(["시나리오", "날짜", "구분", "항목", "수량", "단위"])
+            w.writerows(plans_to_rows(plans))
+    finally:
+        if out is not sys.stdout: out.close()
+
+
+if __name__ == "__main__":
+    main()
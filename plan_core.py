@@ -0,0 +1,274 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+# ==============================================================================
+# 엘랑비탈 계획 계산 코어 (UI 비의존)
+# - app.py / Elan-delivery-v.2.1app.py / plan_cli.py 가 공통으로 사용
+# ==============================================================================
+
+# [중요] 한국 표준시(KST) 설정
+KST = timezone(timedelta(hours=9))
+
+# 수율 관리 및 희석 비율 상수
+YIELD_CONSTANTS = {
+    "MILK_BOTTLE_TO_CURD_KG": 0.5,  # 우유 1통(2.3L)당 예상 커드 0.5kg
+    "PACK_UNIT_KG": 0.15,            # 소포장 단위 150g
+    "DRINK_RATIO": 6.5,             # 일반커드 -> 커드시원한것 희석 배수
+    "BOTTLE_SIZE_ML": 280,
+    "MIX_BOTTLE_ML": 150             # 혼합 제품 용기 사이즈 150ml
+}
+
+# [최종 검증 완료] 150ml x 14개 = 2,100ml 제조 기준 정밀 레시피 DB (ERP)
+ERP_RECIPES = {
+    "혼합 [P.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "송이 대사체": 28}},
+    "혼합 [Edf.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "개망초(EDF)": 28}},
+    "혼합 [R.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "장미꽃 대사체": 28}},
+    "혼합 [Ex.P]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "EX": 28}},
+    "혼합 [P.V.E]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 14, "EX": 28}},
+    "혼합 [P.P.E]": {"batch_size": 14, "materials": {"인삼대사체(PAGI) 항암용": 7, "송이 대사체": 7, "EX": 28}},
+    "혼합 [E.R.P.V.P]": {"batch_size": 14, "materials": {"EX": 18, "장미꽃 대사체": 6, "인삼대사체(PAGI) 항암용": 12, "송이 대사체": 6}},
+    "계란커드 스타터": {"batch_size": 9, "materials": {"개망초 대사체": 8, "아카시아잎 대사체": 1}},
+    "철원산삼 대사체": {"batch_size": 9, "materials": {"철원산삼": 1, "EX": 8}}
+}
+
+# 정기배송 계산기 레시피 DB (50ml 단위 / EX·사이다 ml 단위)
+DELIVERY_RECIPES = {
+    "혼합 [E.R.P.V.P]": {"desc": "6배수 혼합/14병", "batch_size": 14, "materials": {"PAGI (50ml)": 12, "송이대사체 (50ml)": 6, "장미꽃 대사체 (50ml)": 6, "Vitamin C (3000mg)": 14, "SiO2 (1ml)": 14, "EX": 900}},
+    "혼합 [P.V.E]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"PAGI (50ml)": 1, "Vitamin C (3000mg)": 1, "EX": 100}},
+    "혼합 [P.P.E]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"송이대사체 (50ml)": 1, "인삼 대사체 (50ml)": 1, "EX": 50}},
+    "혼합 [Ex.P]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"PAGI (50ml)": 1, "EX": 100}},
+    "혼합 [R.P]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"장미꽃 대사체 (50ml)": 1, "PAGI (50ml)": 1, "인삼사이다": 50}},
+    "혼합 [Edf.P]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"EDF (50ml)": 1, "PAGI (50ml)": 1, "인삼사이다": 50}},
+    "혼합 [P.P]": {"desc": "1:1 개별 채움", "batch_size": 1, "materials": {"송이대사체 (50ml)": 1, "PAGI (50ml)": 1, "EX": 50}}
+}
+
+RECIPE_SETS = {"erp": ERP_RECIPES, "delivery": DELIVERY_RECIPES}
+
+# ==============================================================================
+# 1. 회차 계산 엔진 (월요일 준비 보정 로직)
+# ==============================================================================
+BIWEEKLY_KEYWORDS = ["격주", "유방암", "2주"]
+
+def is_biweekly(group_type):
+    return any(word in str(group_type) for word in BIWEEKLY_KEYWORDS)
+
+def delivery_cadence(group):
+    """
+    그룹 -> 발송 주기. ERP 배송 화면의 두 탭과 동일한 기준:
+    그룹명에 '매주'가 있으면 "매주", 그 외(격주/유방암/일반/남양주 등)는 "격주".
+    """
+    return "매주" if "매주" in str(group) else "격주"
+
+def week_diff(start_date_input, current_date_input):
+    """시작일 주 월요일 ~ 기준일 주 월요일 사이의 주차 차이 (시작일 형식 오류 시 예외)."""
+    sd = pd.to_datetime(start_date_input).date()
+    target_date = current_date_input.date() if isinstance(current_date_input, datetime) else current_date_input
+
+    # 시작일과 기준일을 해당 주의 '월요일'로 치환하여 주차 차이 계산
+    start_monday = sd - timedelta(days=sd.weekday())
+    target_monday = target_date - timedelta(days=target_date.weekday())
+
+    return (target_monday - start_monday).days // 7, sd
+
+def calculate_round_final(start_date_input, current_date_input, group_type):
+    """
+    사용자 요청 반영: 월요일 저녁 발송을 위해 낮에 준비하므로,
+    월요일이 되는 순간 즉시 해당 주의 회차로 진입함.
+    12/15 기준 남양주 8회차, 격주 3회차 정확히 출력.
+    """
+    try:
+        if not start_date_input or str(start_date_input).lower() in ['nan', '', 'none']:
+            return 1, "날짜 미입력"
+
+        diff_weeks, sd = week_diff(start_date_input, current_date_input)
+
+        if "매주" in str(group_type):
+            r = diff_weeks + 1
+        elif is_biweekly(group_type):
+            r = (diff_weeks // 2) + 1
+        else:
+            r = 1
+
+        return int(max(r, 1)), sd.strftime('%Y-%m-%d')
+    except:
+        return 1, "형식 오류"
+
+# ==============================================================================
+# 2. 제품 합계 / 혼합 분해
+# ==============================================================================
+def flatten_items(selected):
+    """{환자: {"items": [...]}} 또는 {환자: [...]} 형태를 품목 리스트 하나로 펼침."""
+    out = []
+    for p in selected.values():
+        out.extend(p['items'] if isinstance(p, dict) else p)
+    return out
+
+def product_totals(items, with_volume=False, exclude_mix=False):
+    totals = {}
+    for x in items:
+        if exclude_mix and "혼합" in str(x['제품']): continue
+        k = f"{x['제품']} ({x['용량']})" if with_volume and x.get('용량') else x['제품']
+        totals[k] = totals.get(k, 0) + x['수량']
+    return totals
+
+def mix_requirements(items):
+    req = {}
+    for x in items:
+        if "혼합" in str(x['제품']): req[x['제품']] = req.get(x['제품'], 0) + x['수량']
+    return req
+
+def recipe_materials(recipe, qty):
+    """레시피 1건을 qty개 분량으로 환산. 숫자가 아닌 재료(메모성 값)는 제외."""
+    ratio = qty / recipe['batch_size']
+    return {m: mq * ratio for m, mq in recipe['materials'].items() if isinstance(mq, (int, float))}
+
+def decompose_mixes(mix_req, recipes):
+    """혼합 제품별 재료 소요량과 재료 총합. 레시피가 없는 제품은 건너뜀."""
+    per_product, total = {}, {}
+    for p, q in mix_req.items():
+        if p not in recipes: continue
+        per_product[p] = recipe_materials(recipes[p], q)
+        for m, v in per_product[p].items(): total[m] = total.get(m, 0) + v
+    return per_product, total
+
+def component_totals(product_counts, recipes):
+    """성분 분해 합계: 레시피가 있으면 재료로 분해, 없으면 제품 그대로 합산."""
+    stats = {}
+    for p, q in product_counts.items():
+        parts = recipe_materials(recipes[p], q) if p in recipes else {p: q}
+        for m, v in parts.items(): stats[m] = stats.get(m, 0) + v
+    return stats
+
+# ==============================================================================
+# 3. 단위 환산 ((50ml) / EX / 사이다)
+# ==============================================================================
+def material_amount(name, amount):
+    """혼합 제조 화면의 재료 1줄 단위: (50ml)는 병수+ml, EX·사이다는 ml, 나머지는 개."""
+    if "(50ml)" in name:
+        return {"amount": amount, "unit": "개", "ml": amount * 50}
+    if "EX" in name or "사이다" in name:
+        return {"amount": amount, "unit": "ml"}
+    return {"amount": amount, "unit": "개"}
+
+def material_total(name, amount):
+    """재료 총합 단위: PAGI(희석액 제외) ml 환산, 사이다 300ml 병 환산, EX 리터 환산."""
+    if "PAGI" in name and "희석액" not in name:
+        return {"amount": amount, "unit": "개", "ml": amount * 50}
+    if "사이다" in name:
+        return {"amount": amount, "unit": "ml", "bottles": amount / 300}
+    if "EX" in name:
+        return {"amount": amount, "unit": "ml", "liters": amount / 1000}
+    return {"amount": amount, "unit": "개"}
+
+# ==============================================================================
+# 4. 커드 / 우유 추정
+# ==============================================================================
+def curd_demand_kg(items):
+    """ERP 기준 총 소요 커드 무게: 시원한 계열 40g, 일반 커드 150g."""
+    cp = sum(x['수량'] for x in items if "커드" in x['제품'] and "시원" not in x['제품'])
+    cc = sum(x['수량'] for x in items if "시원" in x['제품'])
+    return (cc * 40 + cp * 150) / 1000
+
+def drink_curd_estimate(items):
+    """커드 시원한 것 병수 -> 희석 전 커드(kg) -> 필요 우유 통수."""
+    cnt = sum(x['수량'] for x in items if x['제품'] == "커드 시원한 것")
+    g = cnt * YIELD_CONSTANTS["BOTTLE_SIZE_ML"]
+    kg = round((g / YIELD_CONSTANTS["DRINK_RATIO"]) / 1000, 2)
+    return {"count": cnt, "curd_kg": kg, "milk_bottles": round(kg / 9 * 16, 1)}
+
+# ==============================================================================
+# 5. 환자 DB 파싱 (구글 시트 vpmi_data / CSV 내보내기 공통)
+# ==============================================================================
+def parse_order_items(raw):
+    """'제품:수량, 제품:수량' 문자열 -> [{"제품", "수량"}]. 수량이 정수가 아닌 항목은 건너뜀."""
+    items = []
+    for item in str(raw).split(','):
+        if ':' in item:
+            p_name, p_qty = item.split(':', 1)
+            try: items.append({"제품": p_name.strip(), "수량": int(p_qty.strip())})
+            except: continue
+    return items
+
+def parse_patient_rows(rows):
+    """시트 행(이름/그룹/비고/기본발송/주문내역/시작일) 목록 -> 환자 DB."""
+    db = {}
+    for row in rows:
+        name = str(row.get('이름', '')).strip()
+        if not name: continue
+        db[name] = {
+            "group": str(row.get('그룹', '일반')),
+            "note": str(row.get('비고', '')),
+            "default": True if str(row.get('기본발송', '')).upper() == 'O' else False,
+            "items": parse_order_items(row.get('주문내역', '')),
+            "start_date_raw": str(row.get('시작일', '')) # 엑셀 시작일 읽기
+        }
+    return db
+
+# ==============================================================================
+# 6. 일일 계획 / 시나리오
+# ==============================================================================
+def is_due(info, target_date, ship_weekday=0):
+    """
+    해당 날짜에 발송 대상인지 판단. 발송(준비) 요일이 아니면 제외, 시작 주 이전이면 제외,
+    격주 주기(delivery_cadence)는 시작 주 기준 짝수 주차에만 발송. 시작일이 없거나 형식 오류면 요일만 확인.
+    """
+    if ship_weekday is not None and target_date.weekday() != ship_weekday: return False
+    start = info.get('start_date_raw', '')
+    if not start or str(start).lower() in ['nan', '', 'none']: return True
+    try: diff_weeks, _ = week_diff(start, target_date)
+    except: return True
+    if diff_weeks < 0: return False
+    return diff_weeks % 2 == 0 if delivery_cadence(info.get('group', '')) == "격주" else True
+
+def select_patients(patient_db, target_date, ship_weekday=0):
+    """발송일에 실제 발송하는 기본발송 환자만 선택하고 회차를 붙임."""
+    selected = {}
+    for name, info in patient_db.items():
+        if not info.get('default', True): continue
+        if not is_due(info, target_date, ship_weekday): continue
+        r_num, _ = calculate_round_final(info.get('start_date_raw', ''), target_date, delivery_cadence(info.get('group', '')))
+        selected[name] = {**info, "round": r_num}
+    return selected
+
+def build_daily_plan(patient_db, recipes, target_date, units="erp", ship_weekday=0):
+    """
+    발송일 하루치 계획(JSON 직렬화 가능). units="delivery"이면 (50ml)/EX/사이다 단위 환산,
+    units="erp"이면 ERP 레시피 기준대로 모든 재료를 병 단위로 표기.
+    ship_weekday(0=월)가 아닌 날짜나 격주 휴무 주차의 환자는 계획에서 빠짐.
+    """
+    selected = select_patients(patient_db, target_date, ship_weekday)
+    items = flatten_items(selected)
+    per_product, total = decompose_mixes(mix_requirements(items), recipes)
+    if units == "delivery":
+        line_fn, total_fn = material_amount, material_total
+    else:
+        line_fn = total_fn = lambda m, v: {"amount": v, "unit": "병"}
+    return {
+        "date": target_date.strftime('%Y-%m-%d'),
+        "patients": {n: p['round'] for n, p in selected.items()},
+        "product_totals": product_totals(items),
+        "packing_totals": product_totals(items, with_volume=True, exclude_mix=True),
+        "mix_materials": {p: {m: line_fn(m, v) for m, v in mats.items()} for p, mats in per_product.items()},
+        "material_totals": {m: total_fn(m, v) for m, v in total.items()},
+        "curd_kg": curd_demand_kg(items),
+        "drink_curd": drink_curd_estimate(items),
+    }
+
+def apply_scenario(patient_db, recipes, scenario):
+    """
+    what-if 시나리오 적용: {"add_patients": {...}, "remove_patients": [...],
+    "recipes": {...}, "scale": {제품: 배수}}. 원본 DB는 변경하지 않음.
+    """
+    db = copy.deepcopy(patient_db)
+    rcp = copy.deepcopy(recipes)
+    db.update(copy.deepcopy(scenario.get('add_patients', {})))
+    for n in scenario.get('remove_patients', []): db.pop(n, None)
+    rcp.update(copy.deepcopy(scenario.get('recipes', {})))
+    for info in db.values(): info.setdefault('items', [])
+    for prd, factor in scenario.get('scale', {}).items():
+        for info in db.values():
+            for x in info['items']:
+                if x['제품'] == prd: x['수량'] = x['수량'] * factor
+    return db, rcp
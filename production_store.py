@@ -0,0 +1,216 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# ==============================================================================
+# 생산 측정값(수율 / pH) 시계열 저장소
+# - 측정값은 로컬 버퍼에 쌓았다가 묶음(batch) 단위로 저장소에 기록
+# - 배치별 / 월별 누적 집계를 기록 시점에 갱신해 두어, 차트가 원본 행을 다시 읽지 않음
+# ==============================================================================
+PRODUCTION_COLUMNS = ["측정일시", "배치", "우유 투입량(통)", "실제 생산량(kg)", "pH"]
+
+
+def _to_float(value):
+    try:
+        if value is None or str(value).strip().lower() in ['', 'nan', 'none']:
+            return None
+        return float(value)
+    except:
+        return None
+
+
+_KO_TS = re.compile(r"(\d{4})\.\s*(\d{1,2})\.\s*(\d{1,2})\.?\s*(오전|오후)?\s*(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+
+def _parse_ts(value):
+    """측정일시 파싱. 시트 한국어 로케일 표기(2025. 12. 15 오후 3:00:00)도 허용, 실패 시 None."""
+    m = _KO_TS.fullmatch(str(value).strip())
+    if m:
+        y, mo, d, ampm, h, mi, sec = m.groups()
+        h = int(h) % 12 + (12 if ampm == "오후" else 0) if ampm else int(h)
+        return datetime(int(y), int(mo), int(d), h, int(mi), int(sec or 0))
+    try:
+        ts = pd.to_datetime(value)
+        return None if pd.isna(ts) else ts.to_pydatetime()
+    except:
+        return None
+
+
+def _new_bucket():
+    return {"milk": 0.0, "actual": 0.0, "yield_n": 0,
+            "ph_sum": 0.0, "ph_n": 0, "ph_min": None, "ph_max": None, "ph_last": None, "ph_ts": None, "last": None}
+
+
+class ProductionStore:
+    """
+    생산 측정값 버퍼 + 사전 집계 저장소.
+    flush_fn(rows)는 행 목록을 저장소(구글 시트 등)에 한 번에 기록하고 성공 여부를 반환.
+    flush_size개가 쌓이면 즉시, 그렇지 않으면 첫 버퍼 행 기준 max_age초 뒤 타이머로 flush.
+    """
+
+    def __init__(self, flush_fn, curd_kg_per_bottle, flush_size=10, max_age=60):
+        self.flush_fn = flush_fn
+        self.curd_kg_per_bottle = curd_kg_per_bottle
+        self.flush_size = flush_size
+        self.max_age = max_age
+        self.skipped = 0              # 측정일시를 해석하지 못해 집계에서 제외된 행 수
+        self.last_flush_ok = True
+        self._buffer = []
+        self._timer = None
+        self._by_batch = {}
+        self._by_month = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    # --------------------------------------------------------------------------
+    # 기록 / 적재
+    # --------------------------------------------------------------------------
+    def load_rows(self, records):
+        """기존 시트 행(get_all_records 결과)으로 집계를 한 번만 구성. 버퍼에는 넣지 않음."""
+        with self._lock:
+            for rec in records:
+                row = [rec.get(c, '') for c in PRODUCTION_COLUMNS]
+                self._aggregate(row)
+
+    def record_yield(self, batch_id, milk_bottles, actual_kg, ts, flush_now=False):
+        return self._record([ts.strftime('%Y-%m-%d %H:%M'), str(batch_id), float(milk_bottles), float(actual_kg), ''], flush_now)
+
+    def record_ph(self, batch_id, ph, ts, flush_now=False):
+        return self._record([ts.strftime('%Y-%m-%d %H:%M'), str(batch_id), '', '', float(ph)], flush_now)
+
+    def _record(self, row, flush_now=False):
+        """
+        행을 버퍼에 추가. 저장소까지 기록되었으면 True, 아직 대기 중이면 False.
+        flush_now=True(화면 저장 버튼)면 대기 행과 함께 즉시 기록, 묶음 기록은 타이머/백그라운드 경로용.
+        """
+        with self._lock:
+            self._aggregate(row)
+            self._buffer.append(row)
+            full = flush_now or len(self._buffer) >= self.flush_size
+            if not full:
+                self._schedule()
+        if full:
+            return self.flush()
+        return False
+
+    def _schedule(self):
+        # _lock 보유 상태에서 호출. 대기 중인 타이머가 없을 때만 새로 건다.
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_age, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        if not self.flush():
+            with self._lock:
+                if self._buffer:
+                    self._schedule()
+
+    def flush(self):
+        """버퍼를 저장소에 일괄 기록. 네트워크 호출은 락 밖에서 하고, 실패 시 행을 버퍼 앞에 되돌림."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return True
+            try:
+                ok = bool(self.flush_fn(rows))
+            except:
+                ok = False
+            with self._lock:
+                self.last_flush_ok = ok
+                if not ok:
+                    self._buffer[:0] = rows
+                if self._buffer:
+                    self._schedule()
+            return ok
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _aggregate(self, row):
+        ts_raw, batch_id, milk, actual, ph = row
+        ts = _parse_ts(ts_raw)
+        if ts is None:
+            self.skipped += 1
+            return
+        milk, actual, ph = _to_float(milk), _to_float(actual), _to_float(ph)
+        month = ts.strftime('%Y-%m')
+        for key, table in ((str(batch_id).strip() or "-", self._by_batch), (month, self._by_month)):
+            b = table.setdefault(key, _new_bucket())
+            if milk is not None and actual is not None:
+                b["milk"] += milk
+                b["actual"] += actual
+                b["yield_n"] += 1
+            if ph is not None:
+                b["ph_sum"] += ph
+                b["ph_n"] += 1
+                b["ph_min"] = ph if b["ph_min"] is None else min(b["ph_min"], ph)
+                b["ph_max"] = ph if b["ph_max"] is None else max(b["ph_max"], ph)
+                if b["ph_ts"] is None or ts >= b["ph_ts"]:
+                    b["ph_last"], b["ph_ts"] = ph, ts
+            b["last"] = ts if b["last"] is None else max(b["last"], ts)
+
+    # --------------------------------------------------------------------------
+    # 집계 조회
+    # --------------------------------------------------------------------------
+    def _frame(self, table, key_name):
+        rows = []
+        for key, b in table.items():
+            expected = b["milk"] * self.curd_kg_per_bottle
+            rows.append({
+                key_name: key,
+                "우유 투입량(통)": b["milk"],
+                "실제 생산량(kg)": b["actual"],
+                "예상 생산량(kg)": expected,
+                "수율 비율": b["actual"] / expected if expected else float("nan"),
+                "pH 평균": b["ph_sum"] / b["ph_n"] if b["ph_n"] else float("nan"),
+                "pH 최저": b["ph_min"] if b["ph_min"] is not None else float("nan"),
+                "pH 최고": b["ph_max"] if b["ph_max"] is not None else float("nan"),
+                "pH 최근": b["ph_last"] if b["ph_last"] is not None else float("nan"),
+                "측정 수": b["yield_n"] + b["ph_n"],
+                "_milk": b["milk"], "_actual": b["actual"], "_ph_sum": b["ph_sum"], "_ph_n": b["ph_n"],
+                "_last": b["last"],
+            })
+        return pd.DataFrame(rows)
+
+    def batch_summary(self):
+        """배치별 수율 비율(실제 / 우유 통수 x MILK_BOTTLE_TO_CURD_KG) 및 pH 요약."""
+        with self._lock:
+            df = self._frame(self._by_batch, "배치")
+        if df.empty:
+            return df
+        df = df.sort_values("_last", ascending=False)
+        return df.drop(columns=[c for c in df.columns if c.startswith("_")]).reset_index(drop=True)
+
+    def monthly_summary(self, window=3):
+        """월별 집계 + 최근 window개월(달력 기준, 측정 없는 달 포함) 이동 집계(가중 평균) 추세."""
+        with self._lock:
+            df = self._frame(self._by_month, "월")
+        if df.empty:
+            return df
+        df.index = pd.PeriodIndex(df.pop("월"), freq="M")
+        df = df.sort_index().drop(columns=["_last"])
+        df = df.reindex(pd.period_range(df.index.min(), df.index.max(), freq="M"))
+        sums = ["우유 투입량(통)", "실제 생산량(kg)", "예상 생산량(kg)", "측정 수", "_milk", "_actual", "_ph_sum", "_ph_n"]
+        df[sums] = df[sums].fillna(0)
+        roll = df[["_milk", "_actual", "_ph_sum", "_ph_n"]].rolling(window, min_periods=1).sum()
+        expected = roll["_milk"] * self.curd_kg_per_bottle
+        df[f"수율 비율 ({window}개월)"] = (roll["_actual"] / expected).where(expected > 0)
+        df[f"pH 평균 ({window}개월)"] = (roll["_ph_sum"] / roll["_ph_n"]).where(roll["_ph_n"] > 0)
+        df = df.drop(columns=[c for c in df.columns if c.startswith("_")])
+        ratio_cols = [c for c in df.columns if c.startswith("수율 비율") or c.startswith("pH")]
+        df[ratio_cols] = df[ratio_cols].astype(float)
+        df["측정 수"] = df["측정 수"].astype(int)
+        df.insert(0, "월", df.index.strftime("%Y-%m"))
+        return df.reset_index(drop=True)
@@ -0,0 +1,209 @@
+import copy
+import csv
+import json
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plan_cli
+from plan_core import (DELIVERY_RECIPES, ERP_RECIPES, apply_scenario, build_daily_plan, calculate_round_final,
+                       component_totals, curd_demand_kg, decompose_mixes, delivery_cadence, drink_curd_estimate,
+                       material_amount, material_total, mix_requirements, parse_patient_rows, product_totals,
+                       select_patients)
+
+PATIENTS = {
+    "A": {"group": "매주", "default": True, "start_date_raw": "2025-10-27",
+          "items": [{"제품": "혼합 [P.V.E]", "용량": "150ml", "수량": 14},
+                    {"제품": "커드 시원한 것", "용량": "280ml", "수량": 14}]},
+    "B": {"group": "유방암", "default": True, "start_date_raw": "2025-11-03",
+          "items": [{"제품": "혼합 [R.P]", "용량": "150ml", "수량": 14}, {"제품": "PAGI", "용량": "50ml", "수량": 14}]},
+    "C": {"group": "매주", "default": False, "start_date_raw": "2025-10-27",
+          "items": [{"제품": "EX", "용량": "280ml", "수량": 3}]},
+}
+
+
+def test_component_totals_matches_per_row_loop():
+    rows = [("혼합 [P.P]", 14), ("시원한 것", 5), ("혼합 [P.P]", 7), ("혼합 [P.P.E]", 3), ("시원한 것", 2)]
+    # app.py 의 기존 행 단위 누적 로직
+    expected = {}
+    for prd, qty in rows:
+        if prd in ERP_RECIPES:
+            rcp = ERP_RECIPES[prd]
+            ratio = qty / rcp['batch_size']
+            for mn, mq in rcp['materials'].items(): expected[mn] = expected.get(mn, 0) + (mq * ratio)
+        else: expected[prd] = expected.get(prd, 0) + qty
+    counts = {}
+    for prd, qty in rows: counts[prd] = counts.get(prd, 0) + qty
+    got = component_totals(counts, ERP_RECIPES)
+    assert got.keys() == expected.keys()
+    for k in expected: assert got[k] == pytest.approx(expected[k])
+
+
+def test_decompose_mixes_skips_unknown_and_non_numeric():
+    recipes = {"혼합 [X]": {"batch_size": 2, "materials": {"EX": 100, "메모": "적당히"}}}
+    per_product, total = decompose_mixes({"혼합 [X]": 4, "혼합 [없음]": 1}, recipes)
+    assert per_product == {"혼합 [X]": {"EX": 200}}
+    assert total == {"EX": 200}
+
+
+def test_material_amount_units():
+    assert material_amount("PAGI (50ml)", 3) == {"amount": 3, "unit": "개", "ml": 150}
+    assert material_amount("EX", 100) == {"amount": 100, "unit": "ml"}
+    assert material_amount("인삼사이다", 50) == {"amount": 50, "unit": "ml"}
+    assert material_amount("Vitamin C (3000mg)", 2) == {"amount": 2, "unit": "개"}
+
+
+def test_material_total_units():
+    assert material_total("PAGI (50ml)", 4) == {"amount": 4, "unit": "개", "ml": 200}
+    assert material_total("PAGI 희석액", 4) == {"amount": 4, "unit": "개"}
+    assert material_total("인삼사이다", 600) == {"amount": 600, "unit": "ml", "bottles": 2}
+    assert material_total("EX", 1500) == {"amount": 1500, "unit": "ml", "liters": 1.5}
+    assert material_total("SiO2 (1ml)", 14) == {"amount": 14, "unit": "개"}
+
+
+@pytest.mark.parametrize("cnt", [0, 7, 14, 42])
+def test_drink_curd_estimate_matches_old_literals(cnt):
+    items = [{"제품": "커드 시원한 것", "수량": cnt}, {"제품": "시원한 것", "수량": 99}]
+    kg = round((cnt * 280 / 6.5) / 1000, 2)
+    assert drink_curd_estimate(items) == {"count": cnt, "curd_kg": kg, "milk_bottles": round(kg / 9 * 16, 1)}
+
+
+def test_curd_demand_kg_matches_old_formula():
+    items = [{"제품": "커드", "수량": 2}, {"제품": "커드 시원한 것", "수량": 3}, {"제품": "시원한 것", "수량": 4}]
+    assert curd_demand_kg(items) == pytest.approx((7 * 40 + 2 * 150) / 1000)
+
+
+def test_product_totals_and_mix_requirements():
+    items = [x for p in PATIENTS.values() for x in p['items']]
+    assert product_totals(items, with_volume=True, exclude_mix=True) == {
+        "커드 시원한 것 (280ml)": 14, "PAGI (50ml)": 14, "EX (280ml)": 3}
+    assert mix_requirements(items) == {"혼합 [P.V.E]": 14, "혼합 [R.P]": 14}
+
+
+def test_apply_scenario_leaves_inputs_unmodified():
+    db, rcp = copy.deepcopy(PATIENTS), copy.deepcopy(DELIVERY_RECIPES)
+    scenario = {"add_patients": {"D": {"group": "매주", "items": [{"제품": "EX", "수량": 1}]}},
+                "remove_patients": ["A"], "recipes": {"혼합 [R.P]": {"batch_size": 1, "materials": {"EX": 1}}},
+                "scale": {"PAGI": 2}}
+    snapshot = copy.deepcopy(scenario)
+    new_db, new_rcp = apply_scenario(db, rcp, scenario)
+    assert db == PATIENTS and rcp == DELIVERY_RECIPES and scenario == snapshot
+    assert "A" not in new_db and "D" in new_db
+    assert new_db["B"]["items"][1]["수량"] == 28
+    assert new_rcp["혼합 [R.P]"]["materials"] == {"EX": 1}
+    new_db["D"]["items"][0]["수량"] = 5
+    assert scenario["add_patients"]["D"]["items"][0]["수량"] == 1
+
+
+def test_select_patients_follows_biweekly_schedule_and_weekday():
+    # B(유방암)는 2025-11-03 주 시작 -> 12/15 는 6주차(발송), 12/22 는 7주차(휴무)
+    on = select_patients(PATIENTS, date(2025, 12, 15))
+    off = select_patients(PATIENTS, date(2025, 12, 22))
+    assert {n: p['round'] for n, p in on.items()} == {"A": 8, "B": 4}
+    assert {n: p['round'] for n, p in off.items()} == {"A": 9}
+    assert select_patients(PATIENTS, date(2025, 12, 16)) == {}
+    assert select_patients(PATIENTS, date(2025, 12, 16), ship_weekday=1).keys() == {"A", "B"}
+    assert select_patients(PATIENTS, date(2025, 10, 20)) == {}
+
+
+def test_build_daily_plan_units():
+    plan = build_daily_plan(PATIENTS, DELIVERY_RECIPES, date(2025, 12, 15), units="delivery")
+    assert plan["material_totals"]["EX"] == {"amount": 1400, "unit": "ml", "liters": 1.4}
+    assert plan["mix_materials"]["혼합 [R.P]"]["PAGI (50ml)"] == {"amount": 14, "unit": "개", "ml": 700}
+    erp = build_daily_plan(PATIENTS, ERP_RECIPES, date(2025, 12, 15))
+    assert erp["material_totals"]["EX"] == {"amount": 28, "unit": "병"}
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    p = tmp_path / "patients.json"
+    p.write_text(json.dumps(PATIENTS, ensure_ascii=False), encoding="utf-8")
+    s = tmp_path / "scenarios.json"
+    s.write_text(json.dumps([{"name": "base"}, {"name": "x2", "scale": {"커드 시원한 것": 2}}],
+                            ensure_ascii=False), encoding="utf-8")
+    return p, s
+
+
+def test_cli_json_output(inputs, tmp_path):
+    p, s = inputs
+    out = tmp_path / "plans.json"
+    plan_cli.main(["--patients", str(p), "--recipe-set", "delivery", "--scenarios", str(s),
+                   "--start", "2025-12-15", "--end", "2025-12-22", "--workers", "2", "-o", str(out)])
+    plans = json.loads(out.read_text(encoding="utf-8"))
+    assert [(x["scenario"], x["date"]) for x in plans] == [
+        ("base", "2025-12-15"), ("base", "2025-12-22"), ("x2", "2025-12-15"), ("x2", "2025-12-22")]
+    by_key = {(x["scenario"], x["date"]): x for x in plans}
+    assert by_key[("base", "2025-12-15")]["patients"] == {"A": 8, "B": 4}
+    assert by_key[("base", "2025-12-22")]["patients"] == {"A": 9}
+    assert by_key[("x2", "2025-12-15")]["drink_curd"]["count"] == 28
+
+
+def test_cli_csv_output(inputs, tmp_path):
+    p, _ = inputs
+    out = tmp_path / "plans.csv"
+    plan_cli.main(["--patients", str(p), "--recipe-set", "delivery", "--start", "2025-12-15",
+                   "--format", "csv", "-o", str(out)])
+    with open(out, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["시나리오", "날짜", "구분", "항목", "수량", "단위"]
+    assert ["base", "2025-12-15", "재료 총합", "EX", "1400.0", "ml"] in rows
+    assert ["base", "2025-12-15", "커드", "커드 시원한 것", "14", "개"] in rows
+
+
+def test_cadence_for_other_groups_matches_erp_tabs():
+    # '매주'가 없는 그룹(일반/남양주)은 ERP 화면에서 격주/기타 탭 -> 격주 회차·격주 발송
+    assert delivery_cadence("매주") == "매주"
+    assert delivery_cadence("일반") == delivery_cadence("남양주") == delivery_cadence("유방암") == "격주"
+    db = {"N": {"group": "일반", "default": True, "start_date_raw": "2025-10-27",
+                "items": [{"제품": "EX", "수량": 1}]}}
+    assert calculate_round_final("2025-10-27", date(2025, 12, 15), delivery_cadence("일반"))[0] == 4
+    assert select_patients(db, date(2025, 12, 15)) == {}
+    assert select_patients(db, date(2025, 12, 22))["N"]["round"] == 5
+
+
+def test_apply_scenario_added_patient_without_items():
+    db, _ = apply_scenario(PATIENTS, DELIVERY_RECIPES, {"add_patients": {"Z": {"group": "매주"}}, "scale": {"x": 2}})
+    assert db["Z"]["items"] == []
+    assert build_daily_plan(db, DELIVERY_RECIPES, date(2025, 12, 15))["patients"]["Z"] == 1
+
+
+def test_parse_patient_rows():
+    db = parse_patient_rows([
+        {"이름": " 홍길동 ", "그룹": "매주", "비고": "", "기본발송": "o", "주문내역": "EX:3, 혼합 [P.P]:14, 잘못:abc",
+         "시작일": "2025-10-27"},
+        {"이름": "", "주문내역": "EX:1"},
+    ])
+    assert db == {"홍길동": {"group": "매주", "note": "", "default": True, "start_date_raw": "2025-10-27",
+                             "items": [{"제품": "EX", "수량": 3}, {"제품": "혼합 [P.P]", "수량": 14}]}}
+
+
+def test_ship_dates_follow_weekday():
+    assert plan_cli.ship_dates(date(2025, 12, 10), date(2025, 12, 29), 0) == [
+        date(2025, 12, 15), date(2025, 12, 22), date(2025, 12, 29)]
+    assert plan_cli.ship_dates(date(2025, 12, 16), date(2025, 12, 21), 0) == []
+
+
+def test_cli_reads_sheet_csv_export(tmp_path):
+    src = tmp_path / "vpmi_data.csv"
+    with open(src, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["이름", "그룹", "비고", "기본발송", "주문내역", "시작일"])
+        w.writerow(["A", "매주", "", "O", "커드 시원한 것:14, 혼합 [P.P]:14", "2025-10-27"])
+        w.writerow(["B", "일반", "", "X", "EX:3", "2025-10-27"])
+    out = tmp_path / "plans.json"
+    plan_cli.main(["--patients", str(src), "--start", "2025-12-15", "-o", str(out)])
+    plans = json.loads(out.read_text(encoding="utf-8"))
+    assert len(plans) == 1 and plans[0]["patients"] == {"A": 8}
+    assert plans[0]["material_totals"]["송이 대사체"] == {"amount": 28, "unit": "병"}
+
+
+def test_cli_rejects_malformed_scenarios(inputs, tmp_path):
+    p, _ = inputs
+    bad = tmp_path / "bad.json"
+    bad.write_text(json.dumps([{"name": "b", "scale": {"EX": "two"}}]), encoding="utf-8")
+    with pytest.raises(SystemExit):
+        plan_cli.main(["--patients", str(p), "--scenarios", str(bad), "--start", "2025-12-15"])
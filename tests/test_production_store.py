@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from production_store import ProductionStore, _parse_ts
+
+
+class Sink:
+    """flush_fn 대역: 기록된 묶음을 모으고, ok=False면 실패를 흉내냄."""
+
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.batches = []
+        self.called = threading.Event()
+
+    def __call__(self, rows):
+        self.batches.append(list(rows))
+        self.called.set()
+        return self.ok
+
+
+def _wait(pred, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if pred(): return True
+        time.sleep(0.01)
+    return pred()
+
+
+def test_flush_at_flush_size():
+    sink = Sink()
+    store = ProductionStore(sink, 0.5, flush_size=3, max_age=60)
+    assert store.record_ph("A", 4.1, datetime(2025, 9, 1)) is False
+    assert store.record_ph("A", 4.2, datetime(2025, 9, 2)) is False
+    assert sink.batches == [] and store.pending == 2
+    assert store.record_ph("A", 4.3, datetime(2025, 9, 3)) is True
+    assert len(sink.batches) == 1 and len(sink.batches[0]) == 3
+    assert store.pending == 0
+
+
+def test_flush_now_writes_immediately():
+    sink = Sink()
+    store = ProductionStore(sink, 0.5, flush_size=10, max_age=60)
+    assert store.record_yield("A", 30, 15, datetime(2025, 9, 1), flush_now=True) is True
+    assert sink.batches == [[["2025-09-01 00:00", "A", 30.0, 15.0, ""]]]
+
+
+def test_timed_flush():
+    sink = Sink()
+    store = ProductionStore(sink, 0.5, flush_size=10, max_age=0.05)
+    store.record_ph("A", 4.1, datetime(2025, 9, 1))
+    store.record_ph("A", 4.2, datetime(2025, 9, 2))
+    assert sink.called.wait(2.0)
+    assert _wait(lambda: store.pending == 0)
+    assert len(sink.batches) == 1 and len(sink.batches[0]) == 2
+
+
+def test_failed_flush_requeues_and_reschedules():
+    sink = Sink(ok=False)
+    store = ProductionStore(sink, 0.5, flush_size=2, max_age=0.05)
+    store.record_ph("A", 4.1, datetime(2025, 9, 1))
+    assert store.record_ph("A", 4.2, datetime(2025, 9, 2)) is False
+    assert store.pending == 2 and store.last_flush_ok is False
+    # 실패한 행은 버퍼 앞에 되돌려지고, 이후 행은 그 뒤에 붙음
+    store.record_ph("A", 4.5, datetime(2025, 9, 3))
+    assert store.pending == 3
+    sink.ok = True
+    assert _wait(lambda: store.pending == 0)
+    assert [r[4] for r in sink.batches[-1]] == [4.1, 4.2, 4.5]
+    assert store.last_flush_ok is True
+
+
+def test_parse_ts_korean_locale():
+    assert _parse_ts("2025. 12. 15 오후 3:00:00") == datetime(2025, 12, 15, 15, 0, 0)
+    assert _parse_ts("2025. 12. 15 오전 12:30:00") == datetime(2025, 12, 15, 0, 30, 0)
+    assert _parse_ts("2025-12-15 10:00") == datetime(2025, 12, 15, 10, 0)
+    assert _parse_ts("garbage") is None
+
+
+def test_unparseable_rows_are_counted():
+    store = ProductionStore(Sink(), 0.5)
+    store.load_rows([{"측정일시": "??", "배치": "A", "pH": 4.0}])
+    assert store.skipped == 1
+    assert store.monthly_summary().empty
+
+
+def test_monthly_summary_fills_empty_months_and_rolls_by_calendar():
+    store = ProductionStore(Sink(), 0.5)
+    store.load_rows([
+        {"측정일시": "2025-01-10 10:00", "배치": "A", "우유 투입량(통)": 10, "실제 생산량(kg)": 5},
+        {"측정일시": "2025-05-10 10:00", "배치": "B", "우유 투입량(통)": 10, "실제 생산량(kg)": 4},
+        {"측정일시": "2025-05-11 10:00", "배치": "B", "pH": 4.0},
+        {"측정일시": "2025-06-11 10:00", "배치": "C", "pH": 4.4},
+    ])
+    m = store.monthly_summary(window=3)
+    assert list(m["월"]) == ["2025-01", "2025-02", "2025-03", "2025-04", "2025-05", "2025-06"]
+    assert list(m["측정 수"]) == [1, 0, 0, 0, 2, 1]
+    roll = m.set_index("월")["수율 비율 (3개월)"]
+    # 5월 창(3~5월)은 1월을 포함하지 않음
+    assert roll["2025-03"] == 1.0
+    assert roll["2025-04"] != roll["2025-04"]  # NaN: 2~4월 수율 기록 없음
+    assert roll["2025-05"] == 0.8
+    assert m.set_index("월")["pH 평균 (3개월)"]["2025-06"] == 4.2
+    assert m["수율 비율"].dtype == float and m["pH 최근"].dtype == float
+
+
+def test_ph_last_ignores_newer_yield_rows():
+    store = ProductionStore(Sink(), 0.5)
+    store.load_rows([
+        {"측정일시": "2025-09-01 15:00", "배치": "A", "우유 투입량(통)": 10, "실제 생산량(kg)": 5},
+        {"측정일시": "2025-09-01 14:00", "배치": "A", "pH": 4.3},
+        {"측정일시": "2025-09-01 13:00", "배치": "A", "pH": 4.6},
+    ])
+    assert store.batch_summary().loc[0, "pH 최근"] == 4.3
+    assert store.monthly_summary().loc[0, "pH 최근"] == 4.3
+
+
+def test_batch_summary_keeps_leading_zero_batch_ids():
+    store = ProductionStore(Sink(), 0.5)
+    store.record_yield("0012", 10, 5, datetime(2025, 9, 1))
+    store.load_rows([{"측정일시": "2025-09-02 10:00", "배치": "0012", "pH": 4.2}])
+    b = store.batch_summary()
+    assert list(b["배치"]) == ["0012"]
+    assert b.loc[0, "측정 수"] == 2